@@ -3,10 +3,101 @@ import os
 import json
 import subprocess
 import argparse
+import wave
+
+
+def audio_duration_ms(audio_file):
+    """Return the duration of a WAV file in milliseconds, or None if it can't be read."""
+    try:
+        with wave.open(audio_file, 'rb') as wav:
+            return int(wav.getnframes() * 1000 / wav.getframerate())
+    except (wave.Error, EOFError, OSError):
+        return None
+
+
+def srt_time_to_ms(timestamp):
+    hours, minutes, rest = timestamp.strip().split(':')
+    seconds, millis = rest.split(',')
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(millis)
+
+
+def ms_to_srt_time(ms):
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, millis = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{millis:03d}"
+
+
+def parse_srt_cues(srt_file):
+    """
+    Parse an SRT file into a list of cues.
+
+    Returns:
+        A list of dicts with start_ms, end_ms and text
+    """
+    with open(srt_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    cues = []
+    for block in content.split('\n\n'):
+        lines = block.strip().split('\n')
+        if len(lines) < 3 or '-->' not in lines[1]:
+            continue
+        start, end = lines[1].split('-->')
+        cues.append({
+            'start_ms': srt_time_to_ms(start),
+            'end_ms': srt_time_to_ms(end),
+            'text': '\n'.join(lines[2:]).strip(),
+        })
+    return cues
+
+
+def write_srt_cues(srt_file, cues):
+    with open(srt_file, 'w', encoding='utf-8') as f:
+        for i, cue in enumerate(cues, start=1):
+            f.write(f"{i}\n{ms_to_srt_time(cue['start_ms'])} --> {ms_to_srt_time(cue['end_ms'])}\n{cue['text']}\n\n")
+
+
+def load_checkpoint(checkpoint_file, input_audio_file, end_ms, chunk_ms):
+    """Load the cues finished by a previous run, or start a fresh checkpoint."""
+    stat = os.stat(input_audio_file)
+    # A checkpoint is only reused if the audio file and the windowing are unchanged
+    run = {
+        'input_audio_file': os.path.abspath(input_audio_file),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'end_ms': end_ms,
+        'chunk_ms': chunk_ms,
+    }
+    fresh = dict(run, offset_ms=0, cues=[], stdout='')
+    if not os.path.exists(checkpoint_file):
+        return fresh
+
+    with open(checkpoint_file, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    changed = [key for key in run if checkpoint.get(key) != run[key]]
+    if changed:
+        print(f"Checkpoint '{checkpoint_file}' doesn't match this run ({', '.join(changed)} changed), "
+              "starting from scratch.")
+        return fresh
+
+    print(f"Resuming from checkpoint at offset {ms_to_srt_time(checkpoint['offset_ms'])} "
+          f"({len(checkpoint['cues'])} cues already done).")
+    return checkpoint
+
+
+def save_checkpoint(checkpoint_file, checkpoint):
+    # Write to a temp file first so a crash mid-write can't corrupt the checkpoint
+    tmp_file = checkpoint_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_file, checkpoint_file)
+
 
 # Main function
 
-def main(input_audio_file, output_transcript_file=None, whisper_cpp_home=None, duration_sec=None):
+def main(input_audio_file, output_transcript_file=None, whisper_cpp_home=None, duration_sec=None,
+         chunk_sec=600, overwrite=False):
     if not whisper_cpp_home:
         whisper_cpp_home = os.getenv('WHISPER_CPP_HOME')
         if whisper_cpp_home:
@@ -15,58 +106,111 @@ def main(input_audio_file, output_transcript_file=None, whisper_cpp_home=None, d
             print("Error: --whisper-cpp-home argument or WHISPER_CPP_HOME env var is required.")
             sys.exit(1)
 
+    if not os.path.exists(input_audio_file):
+        print(f"Error: audio file '{input_audio_file}' not found.")
+        sys.exit(1)
+
+    if int(chunk_sec) <= 0:
+        print("Error: --chunk-sec must be a positive number of seconds.")
+        sys.exit(1)
+
     # Convert duration from seconds to milliseconds
     duration_ms = int(duration_sec) * 1000 if duration_sec else None
 
     # Generate transcript using whisper-cli
     srt_file = output_transcript_file if output_transcript_file else os.path.splitext(input_audio_file)[0] + '.srt'
     srt_file_for_whisper = srt_file[:-4] if srt_file.endswith('.srt') else srt_file
+    chunk_srt_file_for_whisper = srt_file_for_whisper + '.part'
+    checkpoint_file = srt_file + '.checkpoint.json'
 
-    # Check if the SRT file already exists
-    if os.path.exists(srt_file):
-        overwrite = input(f"SRT file '{srt_file}' already exists. Do you want to overwrite it? (y/n): ")
-        if overwrite.lower() != 'y':
+    # Check if the SRT file already exists. Only prompt when someone is at the terminal,
+    # so that batch runs don't hang waiting for input.
+    if overwrite:
+        if os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+    elif os.path.exists(srt_file) and not os.path.exists(checkpoint_file):
+        if not sys.stdin.isatty():
+            print(f"SRT file '{srt_file}' already exists, skipping. Use --overwrite to regenerate it.")
+            sys.exit(0)
+        answer = input(f"SRT file '{srt_file}' already exists. Do you want to overwrite it? (y/n): ")
+        if answer.lower() != 'y':
             print("Exiting without overwriting the SRT file.")
             sys.exit(0)
 
+    # Work out where to stop. If the length of the audio can't be read (e.g. not a WAV file)
+    # and no duration was given, fall back to a single whisper-cli run over the whole file.
+    end_ms = audio_duration_ms(input_audio_file)
+    if duration_ms:
+        end_ms = min(end_ms, duration_ms) if end_ms else duration_ms
+    chunk_ms = int(chunk_sec) * 1000
+
+    checkpoint = load_checkpoint(checkpoint_file, input_audio_file, end_ms, chunk_ms)
+
     print(f"Using whisper-cli at: {os.path.join(whisper_cpp_home, 'build/bin/whisper-cli')}")
-    print("Launching whisper-cli subprocess...")
-    try:
-        command = [
-            "cpulimit", "-l", "200", "--",
-            os.path.join(whisper_cpp_home, "build/bin/whisper-cli"),
-            "-m", os.path.join(whisper_cpp_home, "models/ggml-base.en.bin"),
-            "-osrt",
-            f"-of", srt_file_for_whisper,
-            "-oved", "GPU",
-            "-f", input_audio_file,
-            "-ml", "96"
-        ]
-        if duration_ms:
-            command.extend(["--duration", str(duration_ms)])
-        print(f"Running command: {' '.join(command)}")
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        print("whisper-cli subprocess done.")
-    except subprocess.CalledProcessError as e:
-        print(f"Error: whisper-cli subprocess failed with error: {e}")
-        sys.exit(1)
+    while end_ms is None or checkpoint['offset_ms'] < end_ms:
+        offset_ms = checkpoint['offset_ms']
+        window_ms = min(chunk_ms, end_ms - offset_ms) if end_ms else None
 
-    if not os.path.exists(srt_file):
-        print(f"Error: SRT file '{srt_file}' not found.")
-        sys.exit(1)
+        print("Launching whisper-cli subprocess...")
+        try:
+            command = [
+                "cpulimit", "-l", "200", "--",
+                os.path.join(whisper_cpp_home, "build/bin/whisper-cli"),
+                "-m", os.path.join(whisper_cpp_home, "models/ggml-base.en.bin"),
+                "-osrt",
+                f"-of", chunk_srt_file_for_whisper,
+                "-oved", "GPU",
+                "-f", input_audio_file,
+                "-ml", "96",
+                "--offset-t", str(offset_ms)
+            ]
+            if window_ms:
+                command.extend(["--duration", str(window_ms)])
+            print(f"Running command: {' '.join(command)}")
+            result = subprocess.run(command, capture_output=True, text=True, check=True)
+            print("whisper-cli subprocess done.")
+        except subprocess.CalledProcessError as e:
+            print(f"Error: whisper-cli subprocess failed with error: {e}")
+            if offset_ms:
+                print(f"Progress up to {ms_to_srt_time(offset_ms)} is saved in '{checkpoint_file}'. "
+                      "Rerun the same command to resume.")
+            sys.exit(1)
+
+        chunk_srt_file = chunk_srt_file_for_whisper + '.srt'
+        if not os.path.exists(chunk_srt_file):
+            print(f"Error: SRT file '{chunk_srt_file}' not found.")
+            sys.exit(1)
+
+        # whisper-cli timestamps are relative to the start of the file, not the offset
+        cues = parse_srt_cues(chunk_srt_file)
+        if window_ms:
+            # --duration isn't a hard stop: the last decode can run past the window, and that
+            # speech will be transcribed again by the next window, so trim it off here
+            window_end_ms = offset_ms + window_ms
+            cues = [cue for cue in cues if cue['start_ms'] < window_end_ms]
+            for cue in cues:
+                cue['end_ms'] = min(cue['end_ms'], window_end_ms)
+        checkpoint['cues'].extend(cues)
+        checkpoint['stdout'] += result.stdout
+        os.remove(chunk_srt_file)
+        if end_ms is None:
+            break
+        checkpoint['offset_ms'] = offset_ms + window_ms
+        save_checkpoint(checkpoint_file, checkpoint)
+        print(f"Checkpoint saved at {ms_to_srt_time(checkpoint['offset_ms'])} of {ms_to_srt_time(end_ms)}.")
+
+    write_srt_cues(srt_file, checkpoint['cues'])
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
 
     # Output the result
-    if output_transcript_file:
-        with open(output_transcript_file, 'r', encoding='utf-8') as file:
-            print(file.read())
-    else:
-        with open(srt_file, 'r', encoding='utf-8') as file:
-            print(file.read())
+    with open(srt_file, 'r', encoding='utf-8') as file:
+        print(file.read())
 
     # Save the transcript to a file
     transcript_file = os.path.splitext(input_audio_file)[0] + '_transcript.txt'
     with open(transcript_file, 'w') as file:
-        file.write(result.stdout)
+        file.write(checkpoint['stdout'])
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Generate transcripts from audio files using whisper-cli.')
@@ -74,6 +218,9 @@ if __name__ == '__main__':
     parser.add_argument('--output-transcript-file', help='Path to the output transcript file')
     parser.add_argument('--whisper-cpp-home', help='Path to the Whisper CPP home directory')
     parser.add_argument('--duration-sec', type=int, help='Duration in seconds for processing')
+    parser.add_argument('--chunk-sec', type=int, default=600, help='Length of each checkpointed window in seconds (default: 600)')
+    parser.add_argument('--overwrite', action='store_true', help='Overwrite an existing SRT file and discard any checkpoint without asking')
     args = parser.parse_args()
 
-    main(args.input_audio_file, args.output_transcript_file, args.whisper_cpp_home, args.duration_sec)
+    main(args.input_audio_file, args.output_transcript_file, args.whisper_cpp_home, args.duration_sec,
+         args.chunk_sec, args.overwrite)
@@ -0,0 +1,319 @@
+import sys
+import os
+import time
+import wave
+import json
+import uuid
+import queue
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+import urllib.error
+
+# Transcribe a queue of audio files with a pool of long-lived whisper-server
+# processes, so the model is loaded once per worker instead of once per file.
+
+SERVER_STARTUP_TIMEOUT_SEC = 120
+
+
+def detect_cpu_cores():
+    """Return the number of cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def plan_workers(num_files, cpu_budget_percent, threads_per_job=None, jobs=None):
+    """
+    Size the worker pool from the detected cores and a CPU budget.
+
+    The budget is in cpulimit-style percent (200 = two full cores).
+
+    Returns:
+        A tuple (jobs, threads_per_job)
+    """
+    cores = detect_cpu_cores()
+    budget_cores = max(1, min(cores, cpu_budget_percent // 100))
+
+    if not jobs:
+        # whisper.cpp defaults to 4 threads; more per job gives diminishing returns
+        jobs = max(1, budget_cores // (threads_per_job or 4))
+    jobs = max(1, min(jobs, num_files))
+    if not threads_per_job:
+        threads_per_job = max(1, budget_cores // jobs)
+
+    print(f"Detected {cores} cores, CPU budget {cpu_budget_percent}% -> "
+          f"{jobs} job(s) x {threads_per_job} thread(s)")
+    return jobs, threads_per_job
+
+
+def audio_duration_sec(audio_file):
+    """Return the duration of a WAV file in seconds, or None if it can't be read."""
+    try:
+        with wave.open(audio_file, 'rb') as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except (wave.Error, EOFError, OSError):
+        return None
+
+
+def start_server(whisper_cpp_home, server_bin, model, port, threads, max_len, log_dir):
+    command = [
+        server_bin or os.path.join(whisper_cpp_home, "build/bin/whisper-server"),
+        "-m", model or os.path.join(whisper_cpp_home, "models/ggml-base.en.bin"),
+        "-t", str(threads),
+        "-ml", str(max_len),
+        "--host", "127.0.0.1",
+        "--port", str(port),
+    ]
+    print(f"Running command: {' '.join(command)}")
+    with open(server_log_file(log_dir, port), 'w') as log:
+        return subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=log)
+
+
+def server_log_file(log_dir, port):
+    return os.path.join(log_dir, f"whisper-server-{port}.log")
+
+
+def print_server_log(log_dir, port, max_lines=20):
+    """Print the tail of a server's stderr log, to show why it failed."""
+    log_file = server_log_file(log_dir, port)
+    try:
+        with open(log_file, 'r', encoding='utf-8', errors='replace') as f:
+            lines = f.read().splitlines()[-max_lines:]
+    except OSError:
+        return
+    print(f"Last lines of {log_file}:")
+    for line in lines:
+        print(f"    {line}")
+
+
+def server_exited(process, timeout=1):
+    """Return True if the server process has exited, giving it a moment to finish dying."""
+    try:
+        process.wait(timeout=timeout)
+        return True
+    except subprocess.TimeoutExpired:
+        return False
+
+
+def port_is_free(port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        # Like whisper-server itself, don't count leftover TIME_WAIT connections as "in use"
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(("127.0.0.1", port))
+            return True
+        except OSError:
+            return False
+
+
+def find_free_port(start_port):
+    """Return the first port from start_port up that nothing is listening on."""
+    port = start_port
+    while not port_is_free(port):
+        print(f"Port {port} is in use, trying {port + 1}")
+        port += 1
+    return port
+
+
+def wait_for_server(process, port):
+    """Block until the server's /health endpoint returns 200, i.e. the model is loaded."""
+    deadline = time.perf_counter() + SERVER_STARTUP_TIMEOUT_SEC
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+        except urllib.error.HTTPError:
+            # Listening but not ready yet (503 while the model loads)
+            time.sleep(0.2)
+            continue
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+            continue
+        # Make sure it was our server that answered, not something else that had the port
+        return not server_exited(process, timeout=0.5)
+    return False
+
+
+def transcribe_file(port, audio_file):
+    """POST an audio file to a whisper-server and return the SRT text."""
+    boundary = uuid.uuid4().hex
+    with open(audio_file, 'rb') as f:
+        audio = f.read()
+
+    body = b''.join([
+        f'--{boundary}\r\n'.encode(),
+        f'Content-Disposition: form-data; name="file"; filename="{os.path.basename(audio_file)}"\r\n'.encode(),
+        b'Content-Type: application/octet-stream\r\n\r\n',
+        audio,
+        f'\r\n--{boundary}\r\n'.encode(),
+        b'Content-Disposition: form-data; name="response_format"\r\n\r\n',
+        b'srt',
+        f'\r\n--{boundary}--\r\n'.encode(),
+    ])
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/inference",
+        data=body,
+        headers={'Content-Type': f'multipart/form-data; boundary={boundary}'},
+    )
+    with urllib.request.urlopen(request) as response:
+        return response.read().decode('utf-8')
+
+
+def server_error(response_text):
+    """
+    Return the error message if whisper-server answered with a JSON error instead of SRT.
+
+    whisper-server reports some failures (e.g. undecodable audio) with HTTP 200 and a
+    body like {"error": "failed to read audio file"}.
+    """
+    try:
+        body = json.loads(response_text)
+    except ValueError:
+        return None
+    if isinstance(body, dict) and 'error' in body:
+        return str(body['error'])
+    return None
+
+
+def worker(port, process, log_dir, jobs_queue, results):
+    while True:
+        try:
+            audio_file = jobs_queue.get_nowait()
+        except queue.Empty:
+            return
+
+        srt_file = os.path.splitext(audio_file)[0] + '.srt'
+        start = time.perf_counter()
+        try:
+            srt_text = transcribe_file(port, audio_file)
+        except urllib.error.HTTPError as e:
+            # The server rejected this particular file
+            print(f"Error: transcription of '{audio_file}' failed with error: {e}")
+            results.append((audio_file, None, None))
+            continue
+        except (urllib.error.URLError, OSError) as e:
+            if server_exited(process):
+                # Hand the file back to the healthy workers instead of draining the queue
+                print(f"Error: whisper-server on port {port} exited (code {process.returncode}), "
+                      f"returning '{audio_file}' to the queue.")
+                print_server_log(log_dir, port)
+                jobs_queue.put(audio_file)
+                return
+            print(f"Error: transcription of '{audio_file}' failed with error: {e}")
+            results.append((audio_file, None, None))
+            continue
+        elapsed = time.perf_counter() - start
+
+        error = server_error(srt_text)
+        if error:
+            print(f"Error: transcription of '{audio_file}' failed with error: {error}")
+            results.append((audio_file, None, None))
+            continue
+
+        with open(srt_file, 'w', encoding='utf-8') as f:
+            f.write(srt_text)
+
+        audio_sec = audio_duration_sec(audio_file)
+        if audio_sec and elapsed > 0:
+            print(f"Done: {srt_file} ({audio_sec:.1f}s audio in {elapsed:.1f}s, "
+                  f"{audio_sec / elapsed:.2f}x realtime)")
+        else:
+            print(f"Done: {srt_file} ({elapsed:.1f}s)")
+        results.append((audio_file, audio_sec, elapsed))
+
+
+# Main function
+
+def main(input_audio_files, whisper_cpp_home=None, server_bin=None, model=None,
+         cpu_budget=200, threads_per_job=None, jobs=None, base_port=8910, max_len=96):
+    if not whisper_cpp_home and not (server_bin and model):
+        whisper_cpp_home = os.getenv('WHISPER_CPP_HOME')
+        if whisper_cpp_home:
+            print(f"Using WHISPER_CPP_HOME env var: {whisper_cpp_home}")
+        else:
+            print("Error: --whisper-cpp-home argument or WHISPER_CPP_HOME env var is required.")
+            sys.exit(1)
+
+    missing = [f for f in input_audio_files if not os.path.exists(f)]
+    if missing:
+        print(f"Error: audio file(s) not found: {', '.join(missing)}")
+        sys.exit(1)
+
+    jobs, threads_per_job = plan_workers(len(input_audio_files), cpu_budget, threads_per_job, jobs)
+
+    jobs_queue = queue.Queue()
+    for audio_file in input_audio_files:
+        jobs_queue.put(audio_file)
+
+    # One log directory per run, so concurrent runs and reused ports don't clobber each other
+    log_dir = tempfile.mkdtemp(prefix='whisper-server-logs-')
+    servers = []
+    results = []
+    try:
+        port = base_port - 1
+        for _ in range(jobs):
+            port = find_free_port(port + 1)
+            servers.append((port, start_server(whisper_cpp_home, server_bin, model, port, threads_per_job, max_len, log_dir)))
+
+        print("Waiting for whisper-server(s) to load the model...")
+        for port, process in servers:
+            if not wait_for_server(process, port):
+                print(f"Error: whisper-server on port {port} failed to start.")
+                print_server_log(log_dir, port)
+                print(f"whisper-server logs are in {log_dir}")
+                sys.exit(1)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(port, process, log_dir, jobs_queue, results))
+                   for port, process in servers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        # Files handed back by dead servers after every other worker had finished
+        while not jobs_queue.empty():
+            audio_file = jobs_queue.get_nowait()
+            print(f"Error: '{audio_file}' was not transcribed, no whisper-server left to take it.")
+            results.append((audio_file, None, None))
+        servers_died = any(process.poll() is not None for _, process in servers)
+    finally:
+        for _, process in servers:
+            process.terminate()
+        for _, process in servers:
+            process.wait()
+
+    failed = [audio_file for audio_file, _, job_elapsed in results if job_elapsed is None]
+    total_audio_sec = sum(audio_sec or 0 for _, audio_sec, _ in results)
+    print(f"Transcribed {len(results) - len(failed)}/{len(input_audio_files)} file(s) in {elapsed:.1f}s")
+    if total_audio_sec and elapsed > 0:
+        print(f"Overall throughput: {total_audio_sec / elapsed:.2f}x realtime")
+    if failed or servers_died:
+        print(f"whisper-server logs are in {log_dir}")
+    else:
+        shutil.rmtree(log_dir, ignore_errors=True)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Transcribe a queue of audio files using a pool of whisper-server processes.')
+    parser.add_argument('input_audio_files', nargs='+', help='Paths to the input audio files')
+    parser.add_argument('--whisper-cpp-home', help='Path to the Whisper CPP home directory')
+    parser.add_argument('--server-bin', help='Path to the whisper-server binary (default: <whisper-cpp-home>/build/bin/whisper-server)')
+    parser.add_argument('--model', help='Path to the model file (default: <whisper-cpp-home>/models/ggml-base.en.bin)')
+    parser.add_argument('--cpu-budget', type=int, default=200, help='CPU budget in percent, as with cpulimit (default: 200)')
+    parser.add_argument('--threads-per-job', type=int, help='Threads per whisper-server (default: derived from CPU budget)')
+    parser.add_argument('--jobs', type=int, help='Number of concurrent jobs (default: derived from CPU budget)')
+    parser.add_argument('--base-port', type=int, default=8910, help='First port for the whisper-server pool (default: 8910)')
+    args = parser.parse_args()
+
+    main(args.input_audio_files, args.whisper_cpp_home, args.server_bin, args.model,
+         args.cpu_budget, args.threads_per_job, args.jobs, args.base_port)